@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models.signals import pre_migrate
+from api_app.connections import checkConnections
+
+
+def createExtensions(using, **kwargs):
+    # Trigram indexes of publications need the extension to exist before they are created
+    with connections[using].cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
 
 
 class ApiAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api_app'
+
+    def ready(self):
+        pre_migrate.connect(createExtensions, sender=self)
+        # Invalidation of cached responses
+        from api_app import signals
+        if settings.CONN_HEALTH_CHECKS:
+            request_started.connect(checkConnections, dispatch_uid='check-connections')
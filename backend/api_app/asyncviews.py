@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from api_app.connections import checkConnections
+
+# Threads of every worker process running the async views, each of them keeps its own database connection
+viewPool = ThreadPoolExecutor(max_workers=settings.API_ASYNC_THREADS, thread_name_prefix='api-async')
+
+def asyncView(view):
+    """
+        Serves a read-only view as an async view when API_ASYNC_VIEWS is set (uvicorn serving backend.asgi).
+        Slow clients are handled by the event loop and only the view itself takes a thread of the pool,
+        while Django runs all sync views of the worker (logins, loans and other writes) in a single thread one after another.
+    """
+    if not settings.API_ASYNC_VIEWS:
+        return view
+
+    def run(request, *args, **kwargs):
+        # Connections of the pool threads are not managed by the request signals
+        close_old_connections()
+        if settings.CONN_HEALTH_CHECKS:
+            checkConnections()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await sync_to_async(run, thread_sensitive=False, executor=viewPool)(request, *args, **kwargs)
+    return wrapper
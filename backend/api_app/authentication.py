@@ -0,0 +1,51 @@
+import hashlib
+from hmac import compare_digest
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from knox.auth import TokenAuthentication
+from knox.settings import CONSTANTS, knox_settings
+from api_app.cache import invalidateNowAndOnCommit
+
+def tokenKey(token_key):
+    return 'api-auth-token:' + token_key
+
+def invalidateTokens(*token_keys):
+    """
+        Removes cached authentication of the tokens, has to be called whenever a token is deleted or its user changes.
+        Signals do it for deleted tokens and saved users.
+    """
+    invalidateNowAndOnCommit(lambda: cache.delete_many([tokenKey(token_key) for token_key in token_keys]))
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+        Knox token authentication remembering authenticated tokens for API_AUTH_CACHE_TIMEOUT seconds,
+        so that following requests with the same token don't query the token and its user again.
+    """
+    def authenticate_credentials(self, token):
+        if not settings.API_AUTH_CACHE_TIMEOUT:
+            return super().authenticate_credentials(token)
+        token = token.decode('utf-8')
+        key = tokenKey(token[:CONSTANTS.TOKEN_KEY_LENGTH])
+        # Only a hash of the whole token is cached, the token itself is never stored
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        cached = cache.get(key)
+        if cached and compare_digest(cached[0], digest):
+            user, auth_token = cached[1:]
+            if auth_token.expiry is None or auth_token.expiry > timezone.now():
+                if knox_settings.AUTO_REFRESH and auth_token.expiry:
+                    self.renew_token(auth_token)
+                    self.cacheToken(key, digest, user, auth_token)
+                return (user, auth_token)
+
+        user, auth_token = super().authenticate_credentials(token.encode())
+        self.cacheToken(key, digest, user, auth_token)
+        return (user, auth_token)
+
+    def cacheToken(self, key, digest, user, auth_token):
+        timeout = settings.API_AUTH_CACHE_TIMEOUT
+        if auth_token.expiry:
+            # Expired tokens must not be accepted from the cache
+            timeout = min(timeout, (auth_token.expiry - timezone.now()).total_seconds())
+        if timeout > 0:
+            cache.set(key, (digest, user, auth_token), timeout)
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import uuid
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+def versionKey(model):
+    return 'api-cache-version:' + model._meta.label_lower
+
+def cacheVersions(models):
+    """
+        Returns current versions of the models, every change of a model gets it a new random version.
+        Versions are kept in the cache shared by all workers, so a change made by any of them invalidates all ETags.
+    """
+    keys = [versionKey(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Version evicted from the cache, a new one makes sure no older response is used
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+def invalidateNowAndOnCommit(invalidate):
+    """
+        Calls the invalidation now and once more when the current transaction commits (at once outside of a transaction),
+        other requests could cache data from before the commit in the meantime.
+    """
+    invalidate()
+    transaction.on_commit(invalidate)
+
+def invalidateCache(*models):
+    """
+        Invalidates cached responses depending on the models, has to be called whenever they change.
+        Signals do it for saved and deleted instances, views have to do it after bulk changes and queryset updates.
+    """
+    invalidateNowAndOnCommit(lambda: cache.set_many({versionKey(model): uuid.uuid4().hex for model in models}, None))
+
+def cachedResponse(*models):
+    """
+        Caches successful responses of a public GET endpoint by its full URL (including query).
+        Cached response is used until any of the models changes or API_CACHE_TIMEOUT passes.
+        The same key is sent as ETag, clients sending it back in If-None-Match get 304 without any query.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if 'export' in request.query_params:
+                return view(request, *args, **kwargs)
+            signature = json.dumps([request.build_absolute_uri(), cacheVersions(models)])
+            digest = hashlib.md5(signature.encode()).hexdigest()
+            etag = quote_etag(digest)
+            # Weak comparison, compression on the way can make the tag weak
+            if_none_match = [tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+            if etag in if_none_match:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            key = 'api-cache:' + digest
+            cached = cache.get(key)
+            if cached is None:
+                response = view(request, *args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+                cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+                cached = response.data
+            # Any version matches '*', but only of a resource that exists (was found by the view)
+            if '*' in if_none_match:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            return Response(cached, headers={'ETag': etag})
+        return wrapper
+    return decorator
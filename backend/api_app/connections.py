@@ -0,0 +1,10 @@
+from django.db import connections
+
+def checkConnections(**kwargs):
+    """
+        Closes reused database connections that stopped working, the request then opens a new one instead of failing.
+        Only connections kept from previous requests (CONN_MAX_AGE) are checked.
+    """
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
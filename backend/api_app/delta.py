@@ -0,0 +1,70 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.response import Response
+from drf_yasg import openapi
+from api_app.models import Tombstone
+from api_app.pagination import paginatedResponse
+
+"""
+    Query parameters of the endpoints supporting incremental synchronization for Swagger OpenAPI documentation
+"""
+deltaParameters = [
+    openapi.Parameter(
+        "since",
+        openapi.IN_QUERY,
+        description="Lists only items changed after the time (ISO 8601), ids of items deleted since then are in 'deleted' "
+                    "on the first page. Use 'synced_at' of the response as 'since' of the next synchronization. "
+                    "410 means the changes are no longer known, synchronize all items again.",
+        type=openapi.TYPE_STRING,
+        format=openapi.FORMAT_DATETIME
+    ),
+]
+
+def pruneTombstones():
+    """
+        Deletes tombstones older than API_TOMBSTONE_RETENTION days, at most once an hour (called when items are deleted).
+    """
+    if cache.add('api-tombstone-prune', True, 3600):
+        Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=settings.API_TOMBSTONE_RETENTION)).delete()
+
+def deltaResponse(request, queryset, serializer_class, **additional):
+    """
+        Returns one page of items of the queryset changed since the time given by ?since=,
+        deleted items are reported by ids of their tombstones.
+    """
+    try:
+        # '+' of the time zone offset arrives as a space when it isn't encoded in the URL
+        since = parse_datetime(request.query_params['since'].replace(' ', '+'))
+    except ValueError:
+        since = None
+    if since is None:
+        return Response({
+            "status": "error",
+            "data": "Parameter since must be a date and time in ISO 8601 format!"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    now = timezone.now()
+    if since < now - timedelta(days=settings.API_TOMBSTONE_RETENTION):
+        return Response({
+            "status": "error",
+            "data": "Deleted items are remembered for %d days only, synchronize all items again!" % settings.API_TOMBSTONE_RETENTION
+        }, status=status.HTTP_410_GONE)
+    # Changes become visible when their transaction commits, which can be later than their updated_at,
+    # so the next synchronization starts a margin earlier and some items are sent again
+    synced_at = now - timedelta(seconds=settings.API_SYNC_MARGIN)
+    if 'cursor' not in request.query_params:
+        deleted = list(Tombstone.objects.filter(
+            model=queryset.model._meta.label_lower, deleted_at__gt=since
+        ).values_list('object_id', flat=True)[:settings.API_SYNC_MAX_DELETED + 1])
+        if len(deleted) > settings.API_SYNC_MAX_DELETED:
+            return Response({
+                "status": "error",
+                "data": "Too many items were deleted since then, synchronize all items again!"
+            }, status=status.HTTP_410_GONE)
+        additional['deleted'] = deleted
+    return paginatedResponse(request, queryset.filter(updated_at__gt=since), serializer_class, synced_at=synced_at, **additional)
@@ -0,0 +1,79 @@
+import json
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from drf_yasg import openapi
+from api_app.permissions import IsAdministrator
+
+# Number of rows fetched from the database at once during an export
+EXPORT_CHUNK_SIZE = 2000
+
+"""
+    Query parameters of the exportable endpoints for Swagger OpenAPI documentation
+"""
+exportParameters = [
+    openapi.Parameter(
+        "export",
+        openapi.IN_QUERY,
+        description="Administrator only - streams the whole table instead of a page, 'json' (array) or 'jsonl' (JSON Lines), 501 when served by uvicorn workers",
+        type=openapi.TYPE_STRING,
+        enum=["json", "jsonl"]
+    ),
+]
+
+def _rows(queryset):
+    # Walks the table in id ranges instead of QuerySet.iterator() so that prefetch_related is applied to every chunk
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id')[:EXPORT_CHUNK_SIZE])
+        if not chunk:
+            return
+        yield from chunk
+        last_id = chunk[-1].id
+
+def _jsonArray(rows, serializer_class):
+    yield '{"status": "success", "data": ['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps(serializer_class(row).data, cls=JSONEncoder)
+        separator = ','
+    yield ']}'
+
+def _jsonLines(rows, serializer_class):
+    for row in rows:
+        yield json.dumps(serializer_class(row).data, cls=JSONEncoder) + '\n'
+
+EXPORT_FORMATS = {
+    "json": (_jsonArray, "application/json"),
+    "jsonl": (_jsonLines, "application/x-ndjson"),
+}
+
+def exportResponse(request, queryset, serializer_class):
+    """
+        Streams every row of the queryset to the client, rows are read from the database in chunks
+        so the memory used doesn't depend on the size of the table.
+        Not available under ASGI (uvicorn workers), Django 3.2 iterates the stream in the event loop where it can't query the database.
+    """
+    if isinstance(request._request, ASGIRequest):
+        return Response({
+            "status": "error",
+            "data": "Export is not available on this server, it needs gthread or sync gunicorn workers!"
+        }, status=status.HTTP_501_NOT_IMPLEMENTED)
+    if not (IsAuthenticated().has_permission(request, None) and IsAdministrator().has_permission(request, None)):
+        return Response({
+            "status": "error",
+            "data": "Only Administrator can export data!"
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    format = request.query_params.get('export')
+    if format not in EXPORT_FORMATS:
+        return Response({
+            "status": "error",
+            "data": "Unknown export format! Use one of: " + ", ".join(EXPORT_FORMATS)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    generator, content_type = EXPORT_FORMATS[format]
+    response = StreamingHttpResponse(generator(_rows(queryset), serializer_class), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (queryset.model._meta.model_name, format)
+    return response
@@ -0,0 +1,22 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+
+# Passwords are hashed by a few threads of every worker process, so that a burst of logins waits in a queue
+# instead of taking the CPU from all the other requests
+hashingPool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_THREADS, thread_name_prefix='password-hash')
+
+# Logins being hashed or waiting for it, further ones are refused so that they don't occupy all threads of the worker
+loginSlots = threading.BoundedSemaphore(settings.PASSWORD_HASH_THREADS + settings.PASSWORD_HASH_QUEUE)
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+        PBKDF2 with the number of iterations set by PASSWORD_HASH_ITERATIONS.
+        Hashes with another number of iterations are still verified and get updated when the user logs in.
+    """
+    iterations = settings.PASSWORD_HASH_ITERATIONS
+
+    def encode(self, password, salt, iterations=None):
+        # Verification of a password encodes it as well
+        return hashingPool.submit(super().encode, password, salt, iterations).result()
@@ -0,0 +1,36 @@
+from collections import defaultdict
+from django.db.models import F
+from api_app.models import Inventory
+
+COUNTERS = ('total', 'loaned', 'reserved', 'available')
+
+def bookCounters(state):
+    """
+        Returns contribution of a single book to the inventory counters.
+        State is (loaned, reserved) tuple of the book or None if the book doesn't exist.
+    """
+    if state is None:
+        return (0, 0, 0, 0)
+    loaned, reserved = state
+    return (1, int(loaned), int(reserved), int(not loaned and not reserved))
+
+def updateInventory(changes):
+    """
+        Applies changes of books to the inventory counters, has to be called in the same transaction as the change.
+        Changes is an iterable of (publication_id, library_id, old_state, new_state) tuples.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for publication, library, old, new in changes:
+        delta = deltas[(publication, library)]
+        for i, (before, after) in enumerate(zip(bookCounters(old), bookCounters(new))):
+            delta[i] += after - before
+    # Rows are locked by the updates in the same order in every transaction, otherwise two transactions
+    # changing the same publications in another order would deadlock
+    deltas = sorted((pair, delta) for pair, delta in deltas.items() if any(delta))
+    Inventory.objects.bulk_create([
+        Inventory(publication_id=publication, library_id=library) for (publication, library), delta in deltas
+    ], ignore_conflicts=True)
+    for (publication, library), delta in deltas:
+        Inventory.objects.filter(publication_id=publication, library_id=library).update(**{
+            counter: F(counter) + value for counter, value in zip(COUNTERS, delta)
+        })
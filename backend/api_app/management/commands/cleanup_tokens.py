@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from api_app.tokens import TOKEN_BATCH_SIZE, deleteExpiredTokens, describeTokens, tokenStats
+
+class Command(BaseCommand):
+    help = "Deletes expired authentication tokens and shows size of the token table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=TOKEN_BATCH_SIZE, help="Number of tokens deleted by a single query.")
+        parser.add_argument('--stats', action='store_true', help="Only show numbers of tokens, don't delete any.")
+
+    def handle(self, *args, **options):
+        if not options['stats']:
+            deleted = deleteExpiredTokens(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS("%d expired tokens deleted." % deleted))
+        self.stdout.write(describeTokens(tokenStats()).capitalize() + ".")
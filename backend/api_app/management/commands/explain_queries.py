@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from api_app.models import Book, Library, Publication, PublicationOrder, Voting
+
+class Command(BaseCommand):
+    help = "Prints query plans of the most frequent filters of the API, used to check that they are served by indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help="Execute the queries and include real row counts and timings in the plans.",
+        )
+
+    def handle(self, *args, **options):
+        library = Library.objects.order_by('id').first()
+        publication = Publication.objects.order_by('id').first()
+        if library is None or publication is None:
+            raise CommandError("At least one library and one publication are needed to explain the queries!")
+        queries = {
+            "Books of publication in library": Book.objects.filter(publication=publication.id).filter(library=library.id),
+            "Not loaned books of publication in library": Book.objects.filter(publication=publication.id).filter(library=library.id).filter(loaned=False),
+            "Running votings of library": Voting.objects.filter(library=library.id).filter(completed=False).order_by('id'),
+            "Orders of library by delivery": PublicationOrder.objects.filter(library=library.id).filter(delivered=False).order_by('id'),
+            "Orders waiting for delivery": PublicationOrder.objects.filter(delivered=False).order_by('id'),
+        }
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain(analyze=options['analyze']))
+            self.stdout.write("")
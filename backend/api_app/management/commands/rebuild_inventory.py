@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from api_app.inventory import COUNTERS
+from api_app.models import Book, Inventory
+
+class Command(BaseCommand):
+    help = "Rebuilds inventory counters of publications in libraries from books, or just checks them for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Only compare the counters with books and fail if they differ, nothing is changed.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Changes of books (and so of counters) wait until the comparison or rebuild is finished
+            with connection.cursor() as cursor:
+                cursor.execute("LOCK TABLE %s IN SHARE MODE" % Book._meta.db_table)
+            expected = {
+                (row[0], row[1]): tuple(row[2:])
+                for row in Book.objects.values('publication', 'library').annotate(
+                    total_count=Count('id'),
+                    loaned_count=Count('id', filter=Q(loaned=True)),
+                    reserved_count=Count('id', filter=Q(reserved=True)),
+                    available_count=Count('id', filter=Q(loaned=False, reserved=False))
+                ).order_by().values_list('publication', 'library', *[counter + '_count' for counter in COUNTERS])
+            }
+            current = {
+                (row[0], row[1]): tuple(row[2:])
+                for row in Inventory.objects.values_list('publication', 'library', *COUNTERS)
+            }
+            drift = [
+                (key, current.get(key), expected.get(key))
+                for key in sorted(set(expected) | set(current))
+                if current.get(key, (0, 0, 0, 0)) != expected.get(key, (0, 0, 0, 0))
+            ]
+            for (publication, library), found, correct in drift:
+                self.stdout.write("Publication %d in library %d: %s, expected %s" % (publication, library, found, correct))
+            if options['check']:
+                if drift:
+                    raise CommandError("Inventory differs from books for %d publication/library pairs!" % len(drift))
+                self.stdout.write(self.style.SUCCESS("Inventory matches books."))
+                return
+            Inventory.objects.all().delete()
+            Inventory.objects.bulk_create([
+                Inventory(publication_id=publication, library_id=library, **dict(zip(COUNTERS, counters)))
+                for (publication, library), counters in expected.items()
+            ])
+        self.stdout.write(self.style.SUCCESS("Inventory rebuilt, fixed %d publication/library pairs." % len(drift)))
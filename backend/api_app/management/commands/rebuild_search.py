@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api_app.models import PUBLICATION_SEARCH_VECTOR, Publication, listKeys
+
+BATCH_SIZE = 1000
+
+class Command(BaseCommand):
+    help = "Computes search vectors and tag/author lists of all publications again, needed after publications are changed directly in the database."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            publications = list(Publication.objects.only('id', 'tags', 'authors').order_by('id'))
+            for publication in publications:
+                publication.tag_list = listKeys(publication.tags)
+                publication.author_list = listKeys(publication.authors)
+            Publication.objects.bulk_update(publications, ['tag_list', 'author_list'], batch_size=BATCH_SIZE)
+            updated = Publication.objects.update(search_vector=PUBLICATION_SEARCH_VECTOR)
+        self.stdout.write(self.style.SUCCESS("Search vectors and tag/author lists of %d publications rebuilt." % updated))
@@ -1,6 +1,9 @@
+import re
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 
 ###
 #   DATABASE STRUCTURE
@@ -13,6 +16,7 @@ class Library(models.Model):
     city                = models.CharField(max_length=255)
     street              = models.CharField(max_length=255)
     zip_code            = models.CharField(max_length=5)
+    updated_at          = models.DateTimeField(auto_now=True, db_index=True)
 
 ###
 #   USER DATA & MANAGMENT
@@ -121,6 +125,21 @@ class Account(AbstractBaseUser):
 #   DATABASE STRUCTURE
 ###
 
+# Text of the publication searched by /publication/search/, names and authors weigh the most
+PUBLICATION_SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config='simple') +
+    SearchVector('authors', weight='A', config='simple') +
+    SearchVector('tags', weight='B', config='simple') +
+    SearchVector('genre', weight='B', config='simple') +
+    SearchVector('synopsis', weight='C', config='simple')
+)
+
+def listKeys(value):
+    """
+        Splits comma separated tags or authors into normalized keys used for filtering of publications.
+    """
+    return sorted({' '.join(item.split()).casefold() for item in re.split('[,;]', value or '') if item.strip()})
+
 class Publication(models.Model):
     name                = models.CharField(max_length=50)
     series              = models.CharField(max_length=50)
@@ -137,6 +156,39 @@ class Publication(models.Model):
     rated_sum           = models.IntegerField(default=0)
     rated_times         = models.IntegerField(default=0)
     available_at        = models.ManyToManyField(Library)
+    updated_at          = models.DateTimeField(auto_now=True, db_index=True)
+    search_vector       = SearchVectorField(null=True, editable=False)
+    # Normalized values of tags and authors, filled from the text fields on save
+    tag_list            = ArrayField(models.CharField(max_length=255), default=list, editable=False)
+    author_list         = ArrayField(models.CharField(max_length=255), default=list, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='publication_search_idx'),
+            # Fuzzy (trigram) matching of misspelled names and authors
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='publication_name_trgm_idx'),
+            GinIndex(fields=['authors'], opclasses=['gin_trgm_ops'], name='publication_authors_trgm_idx'),
+            GinIndex(fields=['tag_list'], name='publication_tag_list_idx'),
+            GinIndex(fields=['author_list'], name='publication_author_list_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.tag_list = listKeys(self.tags)
+        self.author_list = listKeys(self.authors)
+        super().save(*args, **kwargs)
+        # Search vector is stored, so it has to be computed again whenever the text changes
+        Publication.objects.filter(id=self.id).update(search_vector=PUBLICATION_SEARCH_VECTOR)
+
+class PublicationRating(models.Model):
+    publication         = models.ForeignKey('Publication', on_delete=models.CASCADE)
+    user                = models.ForeignKey('Account', on_delete=models.CASCADE)
+    rate                = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            # Every user can rate a publication just once
+            models.UniqueConstraint(fields=['publication', 'user'], name='unique_publication_rating'),
+        ]
 
 class Book(models.Model):
     STATES = (
@@ -150,6 +202,27 @@ class Book(models.Model):
     section             = models.IntegerField()
     loaned              = models.BooleanField(default=False)
     reserved            = models.BooleanField(default=False)
+    updated_at          = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Books of a publication in a library, optionally just the ones that are not loaned
+            models.Index(fields=['publication', 'library', 'loaned'], name='book_pub_lib_loaned_idx'),
+        ]
+
+class Inventory(models.Model):
+    # Counters of books of the publication in the library, maintained together with changes of books
+    publication         = models.ForeignKey('Publication', on_delete=models.CASCADE)
+    library             = models.ForeignKey('Library', on_delete=models.CASCADE)
+    total               = models.IntegerField(default=0)
+    loaned              = models.IntegerField(default=0)
+    reserved            = models.IntegerField(default=0)
+    available           = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['publication', 'library'], name='unique_inventory'),
+        ]
 
 class PublicationOrder(models.Model):
     publication         = models.ForeignKey('Publication', on_delete=models.RESTRICT)
@@ -158,6 +231,13 @@ class PublicationOrder(models.Model):
     date_of_order       = models.DateTimeField(auto_now_add=True)
     delivered           = models.BooleanField(default=False)
     price               = models.FloatField()
+    updated_at          = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Orders waiting for delivery are few compared to the delivered ones
+            models.Index(fields=['id'], condition=models.Q(delivered=False), name='order_pending_idx'),
+        ]
 
 class BookOrder(models.Model):
     publication_order   = models.ForeignKey('PublicationOrder', on_delete=models.CASCADE)
@@ -174,6 +254,7 @@ class BookLoan(models.Model):
     extension_to        = models.DateTimeField(null=True)
     fine                = models.IntegerField(default=0)
     books               = models.ManyToManyField(Book)
+    updated_at          = models.DateTimeField(auto_now=True, db_index=True)
 
 class WaitingList(models.Model):
     user                = models.ForeignKey('Account', related_name="creator_waiting", on_delete=models.RESTRICT)
@@ -185,12 +266,25 @@ class WaitingList(models.Model):
         models.IntegerField()
     )
 
+    class Meta:
+        indexes = [
+            # Inverted index book id -> reservations, used when books are returned
+            GinIndex(fields=['books']),
+        ]
+
 class Voting(models.Model):
     library             = models.ForeignKey('Library', on_delete=models.CASCADE)
     publication         = models.ForeignKey('Publication', on_delete=models.RESTRICT)
     users               = models.ManyToManyField(Account)
     votes               = models.IntegerField(default=0)
     completed           = models.BooleanField(default=False)
+    updated_at          = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Only running votings are listed for a library
+            models.Index(fields=['library'], condition=models.Q(completed=False), name='voting_lib_running_idx'),
+        ]
 
 class OpeningHours(models.Model):
     library             = models.OneToOneField('Library', on_delete=models.CASCADE)
@@ -205,4 +299,15 @@ class OpeningHours(models.Model):
     close_time          = ArrayField(
         models.TimeField(blank=True),
         size = 7
-    )
\ No newline at end of file
+    )
+
+class Tombstone(models.Model):
+    # Deleted rows of models synchronized by ?since=, model is its label (e.g. api_app.book)
+    model               = models.CharField(max_length=100)
+    object_id           = models.BigIntegerField()
+    deleted_at          = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'deleted_at'], name='tombstone_model_deleted_idx'),
+        ]
@@ -0,0 +1,48 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from drf_yasg import openapi
+
+"""
+    Query parameters of the paginated endpoints for Swagger OpenAPI documentation
+"""
+paginationParameters = [
+    openapi.Parameter(
+        "cursor",
+        openapi.IN_QUERY,
+        description="Cursor of the requested page, taken from the 'next' link of the previous page",
+        type=openapi.TYPE_STRING
+    ),
+    openapi.Parameter(
+        "page_size",
+        openapi.IN_QUERY,
+        description="Number of items on the page (max " + str(settings.API_MAX_PAGE_SIZE) + ")",
+        type=openapi.TYPE_INTEGER
+    ),
+]
+
+# Keyset (cursor) pagination over the primary key
+class KeysetPagination(CursorPagination):
+    ordering = 'id'
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+def paginatedResponse(request, queryset, serializer_class, ordering=None, **additional):
+    """
+        Returns one page of the queryset in the standard response format together with a link to the next page.
+        Pages are selected by id > last seen id, so the cost of a page doesn't depend on its position.
+        Other ordering (e.g. by relevance) can be used, the cursor then holds the last seen value of its first field.
+    """
+    paginator = KeysetPagination()
+    if ordering is not None:
+        paginator.ordering = ordering
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True)
+    return Response({
+        "status": "success",
+        "data": serializer.data,
+        "next": paginator.get_next_link(),
+        **additional
+    }, status=status.HTTP_200_OK)
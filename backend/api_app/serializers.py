@@ -1,6 +1,10 @@
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import serializers
+from .inventory import updateInventory
 from .models import Library, OpeningHours, Publication, Book, PublicationOrder, BookOrder, BookLoan, Voting, WaitingList
 from django.contrib.auth import get_user_model
 from django.contrib.auth import authenticate
@@ -44,7 +48,7 @@ class PublicationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Publication
-        fields = ('__all__')
+        exclude = ('search_vector', 'tag_list', 'author_list')
 # =====================================================================================================================
 
 
@@ -174,7 +178,8 @@ class VotingSerializer(serializers.ModelSerializer):
             'library', 
             'publication', 
             'votes', 
-            'completed'
+            'completed',
+            'updated_at'
         )
 
 class OpeningHoursCreateSerializer(serializers.ModelSerializer):
@@ -248,41 +253,49 @@ class BookLoanCreateSerializer(serializers.ModelSerializer):
         )
 
     def create(self, validated_data):
-        book_loan = BookLoan()
-        book_loan.user = validated_data['creator']
-        book_loan.date_from = validated_data['date_from']
-        book_loan.date_to = validated_data['date_to']
         book_ids = validated_data.pop('books',None)
         if len(book_ids) == 0:
             raise ValueError
-        # Check if all the books are from the same library
-        library = None
-        for id in book_ids:
-            book = get_object_or_404(Book, id=id)
-            if library is None:
-                library = book.library
-            if library.id != book.library.id:
+        with transaction.atomic():
+            # Fetch and lock all requested books at once
+            books = Book.objects.select_for_update().in_bulk(book_ids)
+            if len(books) != len(set(book_ids)):
+                raise Http404
+            # Check if all the books are from the same library
+            libraries = {book.library_id for book in books.values()}
+            if len(libraries) != 1:
                 raise ValueError
-        book_loan.library = library
-        book_loan.save()
-        # Check if books are availiable and add them to bookloan
-        for id in book_ids:
-            book = get_object_or_404(Book, id=id)
-            if book.loaned or book.reserved:
-                book_loan.delete()
+            library = libraries.pop()
+            # Check if books are availiable, otherwise add request to waitlist
+            if any(book.loaned or book.reserved for book in books.values()):
                 wait_list = WaitingList()
                 wait_list.books = book_ids
-                wait_list.library = library
+                wait_list.library_id = library
                 wait_list.user = validated_data['creator']
                 wait_list.date_from = validated_data['date_from']
                 wait_list.date_to = validated_data['date_to']
                 wait_list.save()
-                raise ValidationError("Already reserved or loaned! Added to waitlist!")
+                book_loan = None
             else:
-                book.reserved = True
-                book_loan.books.add(book)
-                book.save()
-        book_loan.save()
+                book_loan = BookLoan()
+                book_loan.user = validated_data['creator']
+                book_loan.library_id = library
+                book_loan.date_from = validated_data['date_from']
+                book_loan.date_to = validated_data['date_to']
+                book_loan.save()
+                for book in books.values():
+                    book.reserved = True
+                    book.updated_at = timezone.now()
+                Book.objects.bulk_update(books.values(), ['reserved', 'updated_at'])
+                updateInventory([
+                    (book.publication_id, book.library_id, (False, False), (False, True)) for book in books.values()
+                ])
+                BookLoan.books.through.objects.bulk_create([
+                    BookLoan.books.through(bookloan_id=book_loan.id, book_id=id) for id in books
+                ])
+        # Raised outside of the transaction so the waitlist entry is kept
+        if book_loan is None:
+            raise ValidationError("Already reserved or loaned! Added to waitlist!")
         return book_loan
 
 # Serializer for BookLoan model
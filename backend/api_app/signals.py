@@ -0,0 +1,47 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils import timezone
+from knox.models import AuthToken
+from api_app.authentication import invalidateTokens
+from api_app.cache import invalidateCache
+from api_app.delta import pruneTombstones
+from api_app.models import Account, Book, BookLoan, Library, OpeningHours, Publication, PublicationOrder, Tombstone, Voting
+
+def modelChanged(sender, **kwargs):
+    invalidateCache(sender)
+
+for model in (Library, OpeningHours, Publication, Voting):
+    post_save.connect(modelChanged, sender=model, dispatch_uid='cache-save-' + model._meta.label_lower)
+    post_delete.connect(modelChanged, sender=model, dispatch_uid='cache-delete-' + model._meta.label_lower)
+
+# Changes of many-to-many fields belong to the model holding them
+def publicationLibrariesChanged(sender, instance, action, reverse, pk_set, **kwargs):
+    invalidateCache(Publication)
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # Libraries are part of the synchronized publication
+        publications = (pk_set or []) if reverse else [instance.id]
+        Publication.objects.filter(id__in=publications).update(updated_at=timezone.now())
+
+def votingUsersChanged(sender, **kwargs):
+    invalidateCache(Voting)
+
+m2m_changed.connect(publicationLibrariesChanged, sender=Publication.available_at.through, dispatch_uid='cache-publication-libraries')
+m2m_changed.connect(votingUsersChanged, sender=Voting.users.through, dispatch_uid='cache-voting-users')
+
+# Deleted rows are remembered, so that ?since= can report them
+def modelDeleted(sender, instance, **kwargs):
+    Tombstone.objects.create(model=sender._meta.label_lower, object_id=instance.id)
+    pruneTombstones()
+
+for model in (Book, BookLoan, Library, Publication, PublicationOrder, Voting):
+    post_delete.connect(modelDeleted, sender=model, dispatch_uid='tombstone-' + model._meta.label_lower)
+
+# Cached authentication ends with the token (logout, deleted user) and is refreshed when the user changes (role, library)
+def tokenDeleted(sender, instance, **kwargs):
+    invalidateTokens(instance.token_key)
+
+def accountSaved(sender, instance, created, **kwargs):
+    if not created:
+        invalidateTokens(*AuthToken.objects.filter(user=instance).values_list('token_key', flat=True))
+
+post_delete.connect(tokenDeleted, sender=AuthToken, dispatch_uid='auth-token-delete')
+post_save.connect(accountSaved, sender=Account, dispatch_uid='auth-account-save')
@@ -1,3 +1,268 @@
-from django.test import TestCase
+import re
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from knox.models import AuthToken
+from .hashers import loginSlots
+from .inventory import updateInventory
+from .models import Account, Book, BookLoan, Library, Publication, PublicationOrder, Tombstone, WaitingList
 
 # Create your tests here.
+class ListQueryCountTests(TestCase):
+    """
+        List endpoints have to resolve many-to-many fields with prefetch_related,
+        number of queries must not depend on the number of listed items.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Account.objects.create_user('admin', 'admin@iis.cz', 'IIS', 'Admin', 'Brno', 'Bozetechova', '61200', 'Czechia', 'admin')
+        cls.admin.role = '4'
+        cls.admin.save()
+        libraries = [Library.objects.create(name="Library", description="", city="Brno", street="Street", zip_code="61200") for i in range(3)]
+        for i in range(10):
+            publication = Publication.objects.create(
+                name="Publication", series="", synopsis="", authors="Author", language="en", ISBN=str(i),
+                date_of_publication=timezone.now(), publisher="Publisher", genre="Genre", pages=100, tags="tag"
+            )
+            publication.available_at.add(*libraries)
+            books = [Book.objects.create(publication=publication, library=libraries[0], section=1) for j in range(2)]
+            loan = BookLoan.objects.create(user=cls.admin, library=libraries[0], date_from=timezone.now(), date_to=timezone.now())
+            loan.books.add(*books)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_publication_list(self):
+        # Publications and their libraries
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/publication/')
+        self.assertEqual(len(response.data['data']), 10)
+        self.assertEqual(len(response.data['data'][0]['available_at']), 3)
+
+    def test_loan_list(self):
+        # Loans and their books, the waiting list has its own endpoint
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/bookloan/')
+        self.assertEqual(len(response.data['data']), 10)
+        self.assertEqual(len(response.data['data'][0]['books']), 2)
+
+class InventoryTests(TestCase):
+    """
+        Inventory counters are changed together with books on every write path,
+        after each step of an order and loan they have to match the books (rebuild_inventory --check).
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.library = Library.objects.create(name="Library", description="", city="Brno", street="Street", zip_code="61200")
+        cls.admin = Account.objects.create_user('admin', 'admin@iis.cz', 'IIS', 'Admin', 'Brno', 'Bozetechova', '61200', 'Czechia', 'admin')
+        cls.admin.role = '4'
+        cls.admin.save()
+        cls.librarian = Account.objects.create_user('librarian', 'librarian@iis.cz', 'IIS', 'Librarian', 'Brno', 'Bozetechova', '61200', 'Czechia', 'librarian')
+        cls.librarian.role = '3'
+        cls.librarian.working_at = cls.library
+        cls.librarian.save()
+        cls.reader = Account.objects.create_user('reader', 'reader@iis.cz', 'IIS', 'Reader', 'Brno', 'Bozetechova', '61200', 'Czechia', 'reader')
+        cls.publication = Publication.objects.create(
+            name="Publication", series="", synopsis="", authors="Author", language="en", ISBN="1",
+            date_of_publication=timezone.now(), publisher="Publisher", genre="Genre", pages=100, tags="tag"
+        )
+
+    def assertInventoryMatchesBooks(self):
+        # Fails with CommandError listing the differences
+        call_command('rebuild_inventory', '--check', stdout=StringIO())
+
+    def test_order_and_loan(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post('/api/order/create/', {
+            "publication": self.publication.id, "library": self.library.id, "date_of_order": timezone.now(),
+            "number_of_books": 2, "price_per_book": 10, "total_price": 20
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        order = PublicationOrder.objects.get()
+        self.assertEqual(client.post('/api/order/%d/deliver/' % order.id).status_code, 200)
+        self.assertInventoryMatchesBooks()
+
+        book, other = Book.objects.order_by('id')
+        dates = {"date_from": timezone.now(), "date_to": timezone.now() + timezone.timedelta(days=7)}
+        client.force_authenticate(self.reader)
+        self.assertEqual(client.post('/api/bookloan/create/', {**dates, "books": [book.id]}, format='json').data['status'], "success")
+        self.assertInventoryMatchesBooks()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.post('/api/bookloan/create/', {**dates, "books": [book.id]}, format='json').data['status'], "waiting")
+        self.assertEqual(WaitingList.objects.count(), 1)
+        self.assertInventoryMatchesBooks()
+
+        loan = BookLoan.objects.get()
+        client.force_authenticate(self.librarian)
+        self.assertEqual(client.post('/api/bookloan/%d/loan/' % loan.id).status_code, 200)
+        self.assertInventoryMatchesBooks()
+        # Returned book is reserved for the waiting list
+        self.assertEqual(client.post('/api/bookloan/%d/receive/' % loan.id).status_code, 200)
+        self.assertInventoryMatchesBooks()
+
+        response = client.put('/api/book/%d/update/' % other.id, {"condition": "2", "section": 2, "loaned": True, "reserved": False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertInventoryMatchesBooks()
+
+    def test_lock_order(self):
+        # Inventory rows have to be inserted first and then updated (locked) ordered by publication and library
+        other = Library.objects.create(name="Other", description="", city="Brno", street="Street", zip_code="61200")
+        pairs = [(self.publication.id, other.id), (self.publication.id, self.library.id)]
+        with CaptureQueriesContext(connection) as queries:
+            updateInventory([(publication, library, None, (False, False)) for publication, library in pairs])
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertEqual(statements, ['INSERT', 'UPDATE', 'UPDATE'])
+        updated = [re.search(r'"library_id" = (\d+)', query['sql']).group(1) for query in queries[1:]]
+        self.assertEqual(updated, [str(library) for publication, library in sorted(pairs)])
+
+class ConditionalGetTests(TestCase):
+    """
+        Cached public endpoints answer If-None-Match with 304, '*' only for resources that exist.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.library = Library.objects.create(name="Library", description="", city="Brno", street="Street", zip_code="61200")
+
+    def test_etag(self):
+        client = APIClient()
+        response = client.get('/api/library/%d/' % self.library.id)
+        self.assertEqual(response.status_code, 200)
+        response = client.get('/api/library/%d/' % self.library.id, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.library.save()
+        response = client.get('/api/library/%d/' % self.library.id, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_any_etag(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/library/%d/' % self.library.id, HTTP_IF_NONE_MATCH='*').status_code, 304)
+        self.assertEqual(client.get('/api/library/99999/', HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+class DeltaTests(TestCase):
+    """
+        Synchronization by ?since= must not miss changes committed after they were made.
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.library = Library.objects.create(name="Library", description="", city="Brno", street="Street", zip_code="61200")
+
+    def test_late_commit(self):
+        # Row changed (updated_at taken) before the synchronization, but committed after it
+        changed_at = timezone.now()
+        response = self.client.get('/api/library/', {'since': (changed_at - timezone.timedelta(hours=1)).isoformat()})
+        Library.objects.filter(id=self.library.id).update(name="Renamed", updated_at=changed_at)
+        response = self.client.get('/api/library/', {'since': response.data['synced_at'].isoformat()})
+        self.assertEqual([item['name'] for item in response.data['data']], ["Renamed"])
+
+    def test_invalid_since(self):
+        self.assertEqual(self.client.get('/api/library/', {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/library/', {'since': '2026-13-01T00:00'}).status_code, 400)
+
+    @override_settings(API_SYNC_MAX_DELETED=1)
+    def test_outdated_since(self):
+        since = timezone.now() - timezone.timedelta(hours=1)
+        self.assertEqual(self.client.get('/api/library/', {'since': (since - timezone.timedelta(days=365)).isoformat()}).status_code, 410)
+        Tombstone.objects.bulk_create([Tombstone(model='api_app.library', object_id=id) for id in (1000, 1001)])
+        self.assertEqual(self.client.get('/api/library/', {'since': since.isoformat()}).status_code, 410)
+
+@override_settings(API_AUTH_CACHE_TIMEOUT=60)
+class AuthCacheTests(TestCase):
+    """
+        Cached authentication must not outlive deleted tokens or changed roles.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Account.objects.create_user('admin', 'admin@iis.cz', 'IIS', 'Admin', 'Brno', 'Bozetechova', '61200', 'Czechia', 'admin')
+        cls.admin.role = '4'
+        cls.admin.save()
+        cls.user = Account.objects.create_user('user', 'user@iis.cz', 'IIS', 'User', 'Brno', 'Bozetechova', '61200', 'Czechia', 'user')
+
+    def login(self, email, password):
+        client = APIClient()
+        token = client.post('/api/auth/login/', {'username': email, 'password': password}, format='json').data['token']
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+        return client
+
+    def test_role_change(self):
+        admin = self.login('admin@iis.cz', 'admin')
+        user = self.login('user@iis.cz', 'user')
+        self.assertEqual(user.get('/api/users/').status_code, 403)
+        self.assertEqual(admin.post('/api/admin/setrole/%d/administrator/' % self.user.id).status_code, 200)
+        self.assertEqual(user.get('/api/users/').status_code, 200)
+        self.assertEqual(admin.post('/api/admin/setrole/%d/registered/' % self.user.id).status_code, 200)
+        self.assertEqual(user.get('/api/users/').status_code, 403)
+
+    def test_deleted_token(self):
+        user = self.login('user@iis.cz', 'user')
+        self.assertEqual(user.get('/api/user/').status_code, 200)
+        self.assertEqual(user.post('/api/auth/logout/').status_code, 204)
+        self.assertEqual(user.get('/api/user/').status_code, 401)
+        user = self.login('user@iis.cz', 'user')
+        self.assertEqual(user.get('/api/user/').status_code, 200)
+        AuthToken.objects.filter(user=self.user).delete()
+        self.assertEqual(user.get('/api/user/').status_code, 401)
+
+class ExportTests(TestCase):
+    """
+        Exports are streamed by WSGI workers only, under ASGI they are refused instead of being cut off.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Account.objects.create_user('admin', 'admin@iis.cz', 'IIS', 'Admin', 'Brno', 'Bozetechova', '61200', 'Czechia', 'admin')
+        cls.admin.role = '4'
+        cls.admin.save()
+        library = Library.objects.create(name="Library", description="", city="Brno", street="Street", zip_code="61200")
+        publication = Publication.objects.create(
+            name="Publication", series="", synopsis="", authors="Author", language="en", ISBN="1",
+            date_of_publication=timezone.now(), publisher="Publisher", genre="Genre", pages=100, tags="tag"
+        )
+        Book.objects.create(publication=publication, library=library, section=1)
+
+    def test_wsgi(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get('/api/book/', {'export': 'jsonl'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+    async def test_asgi(self):
+        response = await AsyncClient().get('/api/book/?export=jsonl')
+        self.assertEqual(response.status_code, 501)
+
+class LoginSlotTests(TestCase):
+    """
+        Logins and registrations hashing a password are refused with 503 while all slots of the hashing pool are taken.
+    """
+    registration = {
+        "username": "reader", "email": "reader@iis.cz", "first_name": "IIS", "last_name": "Reader", "city": "Brno",
+        "street": "Bozetechova", "zip_code": "61200", "country": "Czechia", "password": "reader"
+    }
+
+    def post(self, path, data):
+        taken = 0
+        while loginSlots.acquire(blocking=False):
+            taken += 1
+        try:
+            return APIClient().post(path, data, format='json')
+        finally:
+            for i in range(taken):
+                loginSlots.release()
+
+    def test_registration(self):
+        response = self.post('/api/auth/register/', self.registration)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Account.objects.exists())
+        self.assertEqual(APIClient().post('/api/auth/register/', self.registration, format='json').status_code, 201)
+
+    def test_login(self):
+        Account.objects.create_user('reader', 'reader@iis.cz', 'IIS', 'Reader', 'Brno', 'Bozetechova', '61200', 'Czechia', 'reader')
+        login = {"username": "reader@iis.cz", "password": "reader"}
+        self.assertEqual(self.post('/api/auth/login/', login).status_code, 503)
+        self.assertEqual(APIClient().post('/api/auth/login/', login, format='json').status_code, 200)
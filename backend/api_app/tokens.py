@@ -0,0 +1,73 @@
+import random
+import threading
+import time
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Count, Q
+from django.utils import timezone
+from knox.models import AuthToken
+
+# Number of expired tokens deleted by a single query
+TOKEN_BATCH_SIZE = 1000
+
+def createToken(user):
+    """
+        Creates a new token of the user and returns it, the oldest tokens over API_TOKEN_LIMIT_PER_USER are deleted.
+    """
+    token = AuthToken.objects.create(user)[1]
+    if settings.API_TOKEN_LIMIT_PER_USER:
+        oldest = AuthToken.objects.filter(user=user).order_by('-created').values_list('pk', flat=True)[settings.API_TOKEN_LIMIT_PER_USER:]
+        AuthToken.objects.filter(pk__in=list(oldest)).delete()
+    return token
+
+def deleteExpiredTokens(batch_size=TOKEN_BATCH_SIZE):
+    """
+        Deletes expired tokens in batches and returns their number, the table is not locked for long.
+    """
+    deleted = 0
+    while True:
+        batch = list(AuthToken.objects.filter(expiry__lt=timezone.now()).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += AuthToken.objects.filter(pk__in=batch).delete()[0]
+
+def tokenStats():
+    """
+        Returns numbers of all and expired tokens, users having a token and size of the token table in bytes.
+    """
+    stats = AuthToken.objects.aggregate(
+        tokens=Count('pk'),
+        expired=Count('pk', filter=Q(expiry__lt=timezone.now())),
+        users=Count('user', distinct=True)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_total_relation_size(%s)", [AuthToken._meta.db_table])
+        stats['size'] = cursor.fetchone()[0]
+    return stats
+
+def describeTokens(stats):
+    return "%(tokens)d tokens (%(expired)d expired) of %(users)d users, table size %(size)d bytes" % stats
+
+def startTokenCleanup(log):
+    """
+        Deletes expired tokens every API_TOKEN_CLEANUP_INTERVAL seconds in a background thread of the worker process.
+    """
+    interval = settings.API_TOKEN_CLEANUP_INTERVAL
+    if not interval:
+        return
+
+    def cleanup():
+        # Workers started together don't clean up at the same time
+        time.sleep(random.uniform(0, interval))
+        while True:
+            try:
+                deleted = deleteExpiredTokens()
+                log.info("Deleted %d expired tokens, %s", deleted, describeTokens(tokenStats()))
+            except Exception:
+                log.exception("Deleting expired tokens failed")
+            finally:
+                # Connections of this thread are not closed by finished requests
+                connections.close_all()
+            time.sleep(interval)
+
+    threading.Thread(target=cleanup, name='token-cleanup', daemon=True).start()
@@ -86,6 +86,9 @@ urlpatterns = [
     path('publication/<int:id>/', getPublication),
     path('publication/<int:id>/library/<int:lid>/', getPublicationInLibrary),
     path('publication/library/<int:lid>/', getPublicationsInLibrary),
+    path('publication/availability/', getPublicationAvailability),
+    path('publication/search/', searchPublication),
+    path('publication/facets/', getPublicationFacets),
     path('publication/create/', createPublication),
     path('publication/<int:id>/update/', updatePublication),
     path('publication/<int:id>/rate/<int:rate>/', ratePublication),
@@ -107,6 +110,7 @@ urlpatterns = [
     # Book Loan
     path('bookloan/', getLoan),
     path('bookloan/<int:id>/', getLoan),
+    path('bookloan/waiting/', getWaitingList),
     path('bookloan/library/<int:id>/', getLoanInLibrary),
     path('bookloan/user/', getLoanUser),
     path('bookloan/user/<int:id>/', getLoanUserByID),
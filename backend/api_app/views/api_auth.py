@@ -4,8 +4,9 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from knox.models import AuthToken
+from api_app.hashers import loginSlots
 from api_app.serializers import UserSerializer, LoginSerializer, RegisterSerializer
+from api_app.tokens import createToken
 
 # ===================================== Register a new account =====================================
 """
@@ -44,6 +45,15 @@ userRegisterResponses = {
             }
         }
     ),
+    "503": openapi.Response(
+        description="Too many registrations at the moment!",
+        examples={
+            "application/json": {
+                "status": "error",
+                "data": "<error_details>"
+            }
+        }
+    ),
 }
 
 """
@@ -63,15 +73,24 @@ def UserRegistration(request, *args, **kwargs):
     """
         Function that allows users to create an account in the system.
         This function expects correct data in `request.data` -> checked by RegisterSerializer
+        Password is hashed like on login, registrations over the capacity are refused and should be retried after a second.
     """
     serializer = RegisterSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    user = serializer.save()
+    if not loginSlots.acquire(blocking=False):
+        return Response({
+            "status": "error",
+            "data": "Too many registrations at the moment, try again later."
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"})
+    try:
+        user = serializer.save()
+    finally:
+        loginSlots.release()
 
     return Response({
         "status": "success",
         "user": UserSerializer(user).data,
-        "token": AuthToken.objects.create(user)[1]
+        "token": createToken(user)
     }, status=status.HTTP_201_CREATED)
 # ==================================================================================================
 
@@ -112,6 +131,15 @@ userLoginResponses = {
             }
         }
     ),
+    "503": openapi.Response(
+        description="Too many logins at the moment!",
+        examples={
+            "application/json": {
+                "status": "error",
+                "data": "<error_details>"
+            }
+        }
+    ),
 }
 
 """
@@ -131,13 +159,22 @@ def UserLogin(request, *args, **kwargs):
     """
         Function that allows users login to an existing account in the system.
         This function expects correct data in `request.data` -> checked by LoginSerializer
+        Logins over the capacity of password hashing are refused and should be retried after a second.
     """
-    serializer = LoginSerializer(data=request.data)
-    serializer.is_valid(raise_exception=True)
+    if not loginSlots.acquire(blocking=False):
+        return Response({
+            "status": "error",
+            "data": "Too many logins at the moment, try again later."
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"})
+    try:
+        serializer = LoginSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+    finally:
+        loginSlots.release()
     user = serializer.validated_data
     return Response({
         "status": "success",
         "user": UserSerializer(user).data,
-        "token": AuthToken.objects.create(user)[1]
+        "token": createToken(user)
     }, status=status.HTTP_200_OK)
 # ==================================================================================================
\ No newline at end of file
@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_condition import And, Or
 from rest_framework import status
@@ -6,7 +7,11 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from api_app.delta import deltaParameters, deltaResponse
+from api_app.export import exportParameters, exportResponse
+from api_app.inventory import updateInventory
 from api_app.models import Book
+from api_app.pagination import paginatedResponse, paginationParameters
 from api_app.permissions import IsAdministrator, IsLibrarian
 from api_app.serializers import BookSerializer
 
@@ -29,7 +34,8 @@ bookGetResponses = {
                         "loaned": "<boolean>",
                         "reserved": "<boolean>"
                     }
-                ]
+                ],
+                "next": "<url>"
             }
         }
     ),
@@ -51,6 +57,7 @@ bookGetResponses = {
     tags=["Book"],
     method="GET",
     operation_description="Returns list of all books in the system or just selected one!",
+    manual_parameters=deltaParameters + paginationParameters + exportParameters,
     responses=bookGetResponses,
     security=[]
 )
@@ -69,11 +76,11 @@ def getBook(request, id=None):
         }, status=status.HTTP_200_OK)
 
     items = Book.objects.all()
-    serializer = BookSerializer(items, many=True)
-    return Response({
-        "status": "success",
-        "data": serializer.data
-    }, status=status.HTTP_200_OK)
+    if 'export' in request.query_params:
+        return exportResponse(request, items, BookSerializer)
+    if 'since' in request.query_params:
+        return deltaResponse(request, items, BookSerializer)
+    return paginatedResponse(request, items, BookSerializer)
 # ==================================================================================================
 
 # ====================== List information about all books in specified library =====================
@@ -174,21 +181,24 @@ def updateBook(request, id):
         Expects user to be logged in and have required roles.
         Librarian can edit only Library that he is assigned to!
     """
-    book = get_object_or_404(Book, id=id)
-    if request.user.role == '3' and request.user.working_at is not book.library:
-        return Response({
-            "status": "error",
-            "data": "You do not have permission to modify this book!"
-        }, status=status.HTTP_401_UNAUTHORIZED) 
-    serializer = BookSerializer(book, data=request.data)
-    if serializer.is_valid():
+    with transaction.atomic():
+        book = get_object_or_404(Book.objects.select_for_update(), id=id)
+        if request.user.role == '3' and request.user.working_at_id != book.library_id:
+            return Response({
+                "status": "error",
+                "data": "You do not have permission to modify this book!"
+            }, status=status.HTTP_401_UNAUTHORIZED) 
+        state = (book.loaned, book.reserved)
+        serializer = BookSerializer(book, data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                "status": "error",
+                "data": serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
         serializer.save()
-        return Response({
-            "status": "success",
-            "data": BookSerializer(book).data
-        }, status=status.HTTP_200_OK)
+        updateInventory([(book.publication_id, book.library_id, state, (book.loaned, book.reserved))])
     return Response({
-        "status": "error",
-        "data": serializer.errors
-    }, status=status.HTTP_400_BAD_REQUEST)
+        "status": "success",
+        "data": BookSerializer(book).data
+    }, status=status.HTTP_200_OK)
 # ==================================================================================================
\ No newline at end of file
@@ -1,6 +1,8 @@
 import datetime
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_condition import And, Or
 from rest_framework import status
 from rest_framework.response import Response
@@ -8,7 +10,11 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from api_app.delta import deltaParameters, deltaResponse
+from api_app.export import exportParameters, exportResponse
+from api_app.inventory import updateInventory
 from api_app.models import Account, Book, BookLoan, Library, WaitingList
+from api_app.pagination import paginatedResponse, paginationParameters
 from api_app.permissions import IsAdministrator, IsLibrarian
 from api_app.serializers import BookLoanCreateSerializer, BookLoanSerializer, WaitingListSerializer
 
@@ -35,7 +41,8 @@ loanGetResponses = {
                         "<book_ids>"
                     ]
                 }
-            ]
+            ],
+            "next": "<url>"
             }
         }
     ),
@@ -66,6 +73,7 @@ loanGetResponses = {
     tags=["Book Loan"],
     method="GET",
     operation_description="Returns list of all book loans in the system or just one specified by an id",
+    manual_parameters=deltaParameters + paginationParameters + exportParameters,
     responses=loanGetResponses
 )
 @api_view(['GET'])
@@ -82,15 +90,31 @@ def getLoan(request, id=None):
             "status": "success",
             "data": serializer.data
         }, status=status.HTTP_200_OK)
-    items = BookLoan.objects.all()
-    waits = WaitingList.objects.all()
-    serializer = BookLoanSerializer(items, many=True)
-    serializer_w = WaitingListSerializer(waits, many=True)
-    return Response({
-        "status": "success",
-        "data": serializer.data,
-        "additional": serializer_w.data
-    }, status=status.HTTP_200_OK)
+    items = BookLoan.objects.prefetch_related('books')
+    if 'export' in request.query_params:
+        return exportResponse(request, items, BookLoanSerializer)
+    if 'since' in request.query_params:
+        return deltaResponse(request, items, BookLoanSerializer)
+    return paginatedResponse(request, items, BookLoanSerializer)
+# ==================================================================================================
+
+# ============================== List reservations on the waiting list =============================
+"""
+    Settings for Swagger OpenAPI documentation
+"""
+@swagger_auto_schema(
+    tags=["Book Loan"],
+    method="GET",
+    operation_description="Returns list of all reservations waiting for books in the system",
+    manual_parameters=paginationParameters
+)
+@api_view(['GET'])
+@permission_classes([And(IsAuthenticated, Or(IsAdministrator, IsLibrarian))])
+def getWaitingList(request):
+    """
+        Function that allows user with Administrator or Librarian role to list reservations on the waiting list.
+    """
+    return paginatedResponse(request, WaitingList.objects.all(), WaitingListSerializer)
 # ==================================================================================================
 
 # ================================== List bookloans by a library ===================================
@@ -115,7 +139,7 @@ def getLoanInLibrary(request, id):
             "status": "error",
             "data": "Librarian doesn't have access to this Library!"
         }, status=status.HTTP_401_UNAUTHORIZED) 
-    items = BookLoan.objects.filter(library=id)
+    items = BookLoan.objects.filter(library=id).prefetch_related('books')
     waits = WaitingList.objects.filter(library=id)
     if not items:
         return Response({
@@ -148,7 +172,7 @@ def getLoanUserByID(request, id):
         Function that allows user with Administrator or Librarian role to list bookloans made by user.
         This function expects user to be logged in.
     """
-    items = BookLoan.objects.filter(user=id)
+    items = BookLoan.objects.filter(user=id).prefetch_related('books')
     waits = WaitingList.objects.filter(user=id)
     if not items and not waits:
         return Response({
@@ -181,7 +205,7 @@ def getLoanUser(request):
         Function that allows user to list bookloans he made.
         This function expects user to be logged in.
     """
-    items = BookLoan.objects.filter(user=request.user)
+    items = BookLoan.objects.filter(user=request.user).prefetch_related('books')
     waits = WaitingList.objects.filter(user=request.user)
     if not items and not waits:
         return Response({
@@ -290,72 +314,88 @@ def confirmLoan(request, id):
         Function that allows user with Administrator or Librarian role to confirm a bookloan.
         This function expects user to be logged in.
     """
-    loan = get_object_or_404(BookLoan, id=id)
-    if request.user.role == '3' and request.user.working_at != loan.library:
-        return Response({
-            "status": "error",
-            "data": "Librarian doesn't have access to this Library!"
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    if loan.loans is not None:
-        return Response({
-            "status": "error",
-            "data": "Loan already confirmed!"
-        }, status=status.HTTP_400_BAD_REQUEST)
-    for book in loan.books.all():
-        if book.loaned:
+    with transaction.atomic():
+        loan = get_object_or_404(BookLoan.objects.select_for_update(), id=id)
+        if request.user.role == '3' and request.user.working_at_id != loan.library_id:
+            return Response({
+                "status": "error",
+                "data": "Librarian doesn't have access to this Library!"
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        if loan.loans is not None:
+            return Response({
+                "status": "error",
+                "data": "Loan already confirmed!"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        books = list(loan.books.select_for_update(of=('self',)).values_list('id', 'publication_id', 'library_id', 'reserved'))
+        # Only books that are not loaned yet are flipped, any missing row means a conflict
+        loaned = Book.objects.filter(id__in=[book[0] for book in books], loaned=False).update(loaned=True, updated_at=timezone.now())
+        if loaned != len(books):
+            transaction.set_rollback(True)
             return Response({
                 "status": "error",
                 "data": "Some of the books are already loaned to someone else!"
             }, status=status.HTTP_400_BAD_REQUEST)
-    loan.loans = request.user
-    loan.save()
-    for book in loan.books.all():
-        book.loaned = True
-        book.save()
+        updateInventory([
+            (publication, library, (False, reserved), (True, reserved)) for id, publication, library, reserved in books
+        ])
+        loan.loans = request.user
+        loan.save(update_fields=['loans', 'updated_at'])
     return Response({
         "status": "success"
     }, status=status.HTTP_200_OK)
 # ==================================================================================================
 
 # ====================================== Receive a bookloan ========================================
-def checkListIfAvailable(list):
+def checkListIfAvailable(list, books):
     for id in list:
-        book = Book.objects.get(id=id)
+        book = books.get(id)
         if not book:
             return False
         if book.reserved or book.loaned:
             return False
     return True
 
-def checkListIfValid(list):
+def checkListIfValid(list, books):
     library = None
     for id in list:
-        book = Book.objects.get(id=id)
+        book = books.get(id)
         if not book:
             return False
         if library is None:
-            library = book.library
-        if library.id != book.library.id:
+            library = book.library_id
+        if library != book.library_id:
             return False
     return True
 
-def checkWaitingList():
+def checkWaitingList(freed_ids):
+    """
+        Creates bookloans from reservations that were waiting for some of the freed books.
+        Only reservations containing at least one of the freed books are considered (GIN index on books),
+        their books are loaded in one query and reservations are served in order of creation.
+    """
     found_possible = False
-    waiting_list = WaitingList.objects.all().order_by('date_created')
+    waiting_list = list(WaitingList.objects.filter(books__overlap=list(freed_ids)).order_by('date_created'))
+    if not waiting_list:
+        return found_possible
+    books = Book.objects.select_for_update().in_bulk({id for reservation in waiting_list for id in reservation.books})
     for reservation in waiting_list:
-        if checkListIfAvailable(reservation.books) and checkListIfValid(reservation.books):
+        if checkListIfAvailable(reservation.books, books) and checkListIfValid(reservation.books, books):
             book_loan = BookLoan()
-            book_loan.user = reservation.user
-            book_loan.library = reservation.library
+            book_loan.user_id = reservation.user_id
+            book_loan.library_id = reservation.library_id
             book_loan.date_from = reservation.date_from
             book_loan.date_to = reservation.date_to
             book_loan.save()
-            for id in reservation.books:
-                book = get_object_or_404(Book, id=id)
+            reserved_books = [books[id] for id in set(reservation.books)]
+            for book in reserved_books:
+                # Later reservations in this run see the book as taken
                 book.reserved = True
-                book_loan.books.add(book)
-                book.save()
-            book_loan.save()
+                book.updated_at = timezone.now()
+            Book.objects.bulk_update(reserved_books, ['reserved', 'updated_at'])
+            updateInventory([
+                (book.publication_id, book.library_id, (False, False), (False, True)) for book in reserved_books
+            ])
+            book_loan.books.add(*reserved_books)
             reservation.delete()
             found_possible = True
     return found_possible
@@ -377,25 +417,28 @@ def receiveLoan(request, id):
         Receive means returning loan back to a library.
         This function expects user to be logged in.
     """
-    loan = get_object_or_404(BookLoan, id=id)
-    if request.user.role == '3' and request.user.working_at != loan.library:
-        return Response({
-            "status": "error",
-            "data": "Librarian doesn't have access to this Library!"
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    if loan.receives is not None:
-        return Response({
-            "status": "error",
-            "data": "Loan already returned!"
-        }, status=status.HTTP_400_BAD_REQUEST)
-    loan.receives = request.user
-    loan.save()
-    for book in loan.books.all():
-        book.loaned = False
-        book.reserved = False
-        book.save()
-    # TODO: Check WaitingList and create new bookloans if availiable
-    if checkWaitingList():
+    with transaction.atomic():
+        loan = get_object_or_404(BookLoan.objects.select_for_update(), id=id)
+        if request.user.role == '3' and request.user.working_at_id != loan.library_id:
+            return Response({
+                "status": "error",
+                "data": "Librarian doesn't have access to this Library!"
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        if loan.receives is not None:
+            return Response({
+                "status": "error",
+                "data": "Loan already returned!"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        loan.receives = request.user
+        loan.save(update_fields=['receives', 'updated_at'])
+        books = list(loan.books.select_for_update(of=('self',)).values_list('id', 'publication_id', 'library_id', 'loaned', 'reserved'))
+        freed_ids = [book[0] for book in books]
+        Book.objects.filter(id__in=freed_ids).update(loaned=False, reserved=False, updated_at=timezone.now())
+        updateInventory([
+            (publication, library, (loaned, reserved), (False, False)) for id, publication, library, loaned, reserved in books
+        ])
+        found_possible = checkWaitingList(freed_ids)
+    if found_possible:
         return Response({
             "status": "success",
             "updated": "waiting_list",
@@ -6,7 +6,11 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from api_app.asyncviews import asyncView
+from api_app.cache import cachedResponse
+from api_app.delta import deltaParameters, deltaResponse
 from api_app.models import Library, Account, OpeningHours
+from api_app.pagination import paginatedResponse, paginationParameters
 from api_app.permissions import IsAdministrator, IsLibrarian
 from api_app.serializers import LibrarySerializer, OpeningHoursCreateSerializer, UserSerializer
 
@@ -29,7 +33,8 @@ libraryGetResponses = {
                     "street": "<string>",
                     "zip_code": "<string> # max 5 characters"
                     }
-                ]
+                ],
+                "next": "<url>"
             }
         }
     ),
@@ -46,15 +51,18 @@ libraryGetResponses = {
 """
     Settings for Swagger OpenAPI documentation
 """
+@asyncView
 @swagger_auto_schema(
     tags=["Library"],
     method="GET",
     operation_description="Allows users to get list libraries or just display information about selected library",
+    manual_parameters=deltaParameters + paginationParameters,
     responses=libraryGetResponses,
     security=[]
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cachedResponse(Library)
 def getLibrary(request, id=None):
     """
         Function that allows users list information about all or just selected libraries.
@@ -68,11 +76,9 @@ def getLibrary(request, id=None):
         }, status=status.HTTP_200_OK)
 
     items = Library.objects.all()
-    serializer = LibrarySerializer(items, many=True)
-    return Response({
-        "status": "success",
-        "data": serializer.data
-    }, status=status.HTTP_200_OK)
+    if 'since' in request.query_params:
+        return deltaResponse(request, items, LibrarySerializer)
+    return paginatedResponse(request, items, LibrarySerializer)
 # ==================================================================================================
 
 # ====================================== Create a new library ======================================
@@ -399,6 +405,7 @@ libraryGetHoursResponse = {
 """
     Settings for Swagger OpenAPI documentation
 """
+@asyncView
 @swagger_auto_schema(
     tags=["Library"],
     method="GET",
@@ -407,6 +414,7 @@ libraryGetHoursResponse = {
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cachedResponse(OpeningHours)
 def getOpeningHoursLibrary(request, id):
     """
         Function that allows users to get opening hours of a library.
@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_condition import And, Or
 from rest_framework import status
@@ -6,10 +7,16 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from api_app.delta import deltaParameters, deltaResponse
+from api_app.inventory import updateInventory
 from api_app.models import Book, BookOrder, PublicationOrder
+from api_app.pagination import paginatedResponse, paginationParameters
 from api_app.permissions import IsAdministrator, IsDistributor, IsLibrarian
 from api_app.serializers import BookOrderSerializer, PublicationOrderCreateByAdmin, PublicationOrderCreateByLibrarian, PublicationOrderSerializer
 
+# Number of books inserted by a single query when an order is delivered
+BOOK_BATCH_SIZE = 500
+
 """
     Schema for the possisble responses to a request for a order information
 """
@@ -29,7 +36,8 @@ orderGetResponses = {
                         "delivered": "<boolean>",
                         "price": "<float>"
                     }
-                ]
+                ],
+                "next": "<url>"
             }
         }
     ),
@@ -51,6 +59,7 @@ orderGetResponses = {
     tags=["Order"],
     method="GET",
     operation_description="Returns list of all orders in the system or just information about the one specified by the id.",
+    manual_parameters=deltaParameters + paginationParameters,
     responses=orderGetResponses
 )
 @api_view(['GET'])
@@ -71,11 +80,9 @@ def getOrder(request, id=None):
         }, status=status.HTTP_200_OK)
 
     items = PublicationOrder.objects.all()
-    serializer = PublicationOrderSerializer(items, many=True)
-    return Response({
-        "status": "success",
-        "data": serializer.data
-    }, status=status.HTTP_200_OK)
+    if 'since' in request.query_params:
+        return deltaResponse(request, items, PublicationOrderSerializer)
+    return paginatedResponse(request, items, PublicationOrderSerializer)
 # ==================================================================================================
 
 # ==================== List information about all orders specified by a library ====================
@@ -301,21 +308,28 @@ def deliverOrder(request, id):
     """
         Function that allows users with selected roles to mark publication orders as delivered.
     """
-    publicationOrder = get_object_or_404(PublicationOrder, id=id)
-    if publicationOrder.delivered:
-        return Response({
-            "status": "failure",
-            "data": "Specified order is already delivered!"
-        }, status=status.HTTP_400_BAD_REQUEST)
-    publicationOrder.delivered = True
-    publicationOrder.save()
-    book_order = get_object_or_404(BookOrder, publication_order=id)
-    for i in range(book_order.number_of_books):
-        book = Book()
-        book.publication = publicationOrder.publication
-        book.library = publicationOrder.library
-        book.section = 1
-        book.save()
+    with transaction.atomic():
+        # Locked so that concurrent deliveries of the same order can't create the books twice
+        publicationOrder = get_object_or_404(PublicationOrder.objects.select_for_update(), id=id)
+        if publicationOrder.delivered:
+            return Response({
+                "status": "failure",
+                "data": "Specified order is already delivered!"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        publicationOrder.delivered = True
+        publicationOrder.save(update_fields=['delivered', 'updated_at'])
+        book_order = get_object_or_404(BookOrder, publication_order=id)
+        Book.objects.bulk_create([
+            Book(
+                publication_id=publicationOrder.publication_id,
+                library_id=publicationOrder.library_id,
+                section=1
+            ) for i in range(book_order.number_of_books)
+        ], batch_size=BOOK_BATCH_SIZE)
+        updateInventory(
+            [(publicationOrder.publication_id, publicationOrder.library_id, None, (False, False))] * book_order.number_of_books
+        )
+        publicationOrder.publication.available_at.add(publicationOrder.library_id)
     return Response({
         "status": "success"
     }, status=status.HTTP_200_OK)
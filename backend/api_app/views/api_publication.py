@@ -1,4 +1,13 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import Count, Exists, ExpressionWrapper, F, FloatField, OuterRef, Q
+from django.db.models.functions import Cast, Greatest
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_condition import And, Or
 from rest_framework import status
 from rest_framework.response import Response
@@ -6,11 +15,47 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from api_app.models import Book, Library, Publication, Voting
+from api_app.asyncviews import asyncView
+from api_app.cache import cachedResponse, invalidateCache
+from api_app.delta import deltaParameters, deltaResponse
+from api_app.export import exportParameters, exportResponse
+from api_app.models import Book, Inventory, Library, Publication, PublicationRating, Voting, listKeys
+from api_app.pagination import paginatedResponse, paginationParameters
 from api_app.permissions import IsAdministrator, IsDistributor, IsLibrarian
 from api_app.serializers import BookSerializer, PublicationSerializer
 
 # ================= List information about all publications or just selected one ===================
+"""
+    Query parameters filtering listed publications for Swagger OpenAPI documentation
+"""
+publicationFilterParameters = [
+    openapi.Parameter(
+        "tag",
+        openapi.IN_QUERY,
+        description="Only publications with the tag (case insensitive), can be repeated or comma separated to require all of them",
+        type=openapi.TYPE_STRING
+    ),
+    openapi.Parameter(
+        "author",
+        openapi.IN_QUERY,
+        description="Only publications by the author (case insensitive), can be repeated or comma separated to require all of them",
+        type=openapi.TYPE_STRING
+    ),
+]
+
+def filterPublications(request, items):
+    """
+        Applies tag and author filters from the query to the publications.
+        Filters are answered by GIN indexes of the normalized tag and author lists.
+    """
+    tags = listKeys(','.join(request.query_params.getlist('tag')))
+    authors = listKeys(','.join(request.query_params.getlist('author')))
+    if tags:
+        items = items.filter(tag_list__contains=tags)
+    if authors:
+        items = items.filter(author_list__contains=authors)
+    return items
+
 """
     Schema for the possisble responses to a request for a publication information
 """
@@ -41,7 +86,8 @@ publicationGetResponses = {
                     "rated_sum": "<int>",
                     "rated_times": "<int>"
                     }
-                ]
+                ],
+                "next": "<url>"
             }
         }
     ),
@@ -58,15 +104,18 @@ publicationGetResponses = {
 """
     Settings for Swagger OpenAPI documentation
 """
+@asyncView
 @swagger_auto_schema(
     tags=["Publication"],
     method="GET",
     operation_description="Allows users to list publications or display just selected one.",
+    manual_parameters=publicationFilterParameters + deltaParameters + paginationParameters + exportParameters,
     responses=publicationGetResponses,
     security=[]
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cachedResponse(Publication)
 def getPublication(request, id=None):
     """
         Function that allows users to list all publications or just selected one.
@@ -79,12 +128,12 @@ def getPublication(request, id=None):
             "data": serializer.data
         }, status=status.HTTP_200_OK)
 
-    items = Publication.objects.all()
-    serializer = PublicationSerializer(items, many=True)
-    return Response({
-        "status": "success",
-        "data": serializer.data
-    }, status=status.HTTP_200_OK)
+    items = filterPublications(request, Publication.objects.prefetch_related('available_at'))
+    if 'export' in request.query_params:
+        return exportResponse(request, items, PublicationSerializer)
+    if 'since' in request.query_params:
+        return deltaResponse(request, items, PublicationSerializer)
+    return paginatedResponse(request, items, PublicationSerializer)
 # ==================================================================================================
 
 # ========================== Check if publication is available in library ==========================
@@ -155,48 +204,314 @@ def getPublicationInLibrary(request, id, lid):
     """
     publication = get_object_or_404(Publication, id=id)
     library = get_object_or_404(Library, id=lid)
-    if library in publication.available_at.all():
+    if publication.available_at.filter(id=library.id).exists():
         all_books = Book.objects.filter(publication=id).filter(library=lid)
-        total = all_books.count()
-        availiable_books = Book.objects.filter(publication=id).filter(library=lid).filter(loaned=False)
-        availiable = availiable_books.count()
-        serializer_all = BookSerializer(all_books, many=True)
-        serializer_ava = BookSerializer(availiable_books, many=True)
-        if availiable > 0:
+        availiable_books = all_books.filter(loaned=False)
+        counts = all_books.aggregate(total=Count('id'), availiable=Count('id', filter=Q(loaned=False)))
+        if counts['availiable'] > 0:
             return Response({
                 "status": "available",
-                "available": availiable,
-                "data": serializer_ava.data
+                "available": counts['availiable'],
+                "data": BookSerializer(availiable_books, many=True).data
             }, status=status.HTTP_200_OK)
         else:
             return Response({
                 "status": "owned",
-                "owned": total,
-                "data": serializer_all.data
+                "owned": counts['total'],
+                "data": BookSerializer(all_books, many=True).data
             }, status=status.HTTP_200_OK)
     return Response({
         "status": "not_available"
     }, status=status.HTTP_404_NOT_FOUND)
 # ==================================================================================================
 
+# ================== Availability of multiple publications in multiple libraries ===================
+"""
+    Schema for the possisble responses to a request for an availability of publications
+"""
+publicationAvailabilityResponses = {
+    "200": openapi.Response(
+        description="Availability of publications retrieved successfully!",
+        examples={
+            "application/json": {
+                "status": "success",
+                "data": [
+                    {
+                        "publication": "<int>",
+                        "library": "<int>",
+                        "total": "<int>",
+                        "available": "<int>",
+                        "loaned": "<int>",
+                        "reserved": "<int>"
+                    }
+                ]
+            }
+        }
+    ),
+    "400": openapi.Response(
+        description="Invalid publication or library ids!",
+        examples={
+            "application/json": {
+                "status": "error",
+                "data": "<error_details>"
+            }
+        }
+    )
+}
+"""
+    Settings for Swagger OpenAPI documentation
+"""
+@swagger_auto_schema(
+    tags=["Publication"],
+    method="GET",
+    operation_description="Returns number of all, available, loaned and reserved books of the publications in the libraries. "
+                          "Pairs of publication and library without any books are not listed.",
+    manual_parameters=[
+        openapi.Parameter("publication", openapi.IN_QUERY, description="Comma separated publication ids", type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter("library", openapi.IN_QUERY, description="Comma separated library ids, all libraries if not specified", type=openapi.TYPE_STRING),
+    ],
+    responses=publicationAvailabilityResponses,
+    security=[]
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def getPublicationAvailability(request):
+    """
+        Function that allows users to check availability of many publications at once.
+        Counts are read from the inventory maintained together with books.
+    """
+    try:
+        publications = [int(id) for ids in request.query_params.getlist('publication') for id in ids.split(',')]
+        libraries = [int(id) for ids in request.query_params.getlist('library') for id in ids.split(',')]
+    except ValueError:
+        return Response({
+            "status": "error",
+            "data": "Publication and library ids must be integers!"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if not publications:
+        return Response({
+            "status": "error",
+            "data": "At least one publication id is required!"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    counts = Inventory.objects.filter(publication__in=publications).filter(total__gt=0)
+    if libraries:
+        counts = counts.filter(library__in=libraries)
+    counts = counts.values('publication', 'library', 'total', 'available', 'loaned', 'reserved').order_by('publication', 'library')
+    return Response({
+        "status": "success",
+        "data": list(counts)
+    }, status=status.HTTP_200_OK)
+# ==================================================================================================
+
+# ==================================== Search in publications ======================================
+"""
+    Schema for the possisble responses to a publication search
+"""
+publicationSearchResponses = {
+    "200": publicationGetResponses["200"],
+    "400": openapi.Response(
+        description="Invalid search parameters!",
+        examples={
+            "application/json": {
+                "status": "error",
+                "data": "<error_details>"
+            }
+        }
+    )
+}
+"""
+    Settings for Swagger OpenAPI documentation
+"""
+@swagger_auto_schema(
+    tags=["Publication"],
+    method="GET",
+    operation_description="Searches publications by name, authors, tags, genre and synopsis, the most relevant publications come first. "
+                          "Misspelled names and authors are matched too.",
+    manual_parameters=[
+        openapi.Parameter("q", openapi.IN_QUERY, description="Searched text, supports \"quoted phrases\", OR and -excluded words", type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter("library", openapi.IN_QUERY, description="Only publications available at the library", type=openapi.TYPE_INTEGER),
+        openapi.Parameter("available", openapi.IN_QUERY, description="Only publications with a book that can be loaned right now (in the library if specified)", type=openapi.TYPE_BOOLEAN),
+    ] + publicationFilterParameters + paginationParameters,
+    responses=publicationSearchResponses,
+    security=[]
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def searchPublication(request):
+    """
+        Function that allows users to search in publications.
+        Full-text match uses the stored search vector, fuzzy match the trigram indexes of name and authors.
+    """
+    text = request.query_params.get('q', '').strip()
+    if not text:
+        return Response({
+            "status": "error",
+            "data": "Searched text is required!"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        library = request.query_params.get('library')
+        library = int(library) if library else None
+    except ValueError:
+        return Response({
+            "status": "error",
+            "data": "Library id must be an integer!"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    query = SearchQuery(text, config='simple', search_type='websearch')
+    items = Publication.objects.filter(
+        Q(search_vector=query) | Q(name__trigram_similar=text) | Q(authors__trigram_similar=text)
+    ).annotate(
+        # Double precision, so the relevance of the last item on a page is exact in the cursor of the next one
+        relevance=Cast(
+            SearchRank(F('search_vector'), query) + Greatest(TrigramSimilarity('name', text), TrigramSimilarity('authors', text)),
+            FloatField()
+        )
+    ).prefetch_related('available_at')
+    items = filterPublications(request, items)
+    if library is not None:
+        items = items.filter(available_at=library)
+    if request.query_params.get('available') in ('true', '1'):
+        books = Inventory.objects.filter(publication=OuterRef('id'), available__gt=0)
+        if library is not None:
+            books = books.filter(library=library)
+        items = items.filter(Exists(books))
+    return paginatedResponse(request, items, PublicationSerializer, ordering=('-relevance', 'id'))
+# ==================================================================================================
+
+# ================================ Facet counts of publications ====================================
+"""
+    Fields of publications the catalogue can be browsed by
+"""
+PUBLICATION_FACETS = ('genre', 'language', 'publisher')
+
+"""
+    Schema for the possisble responses to a request for facet counts
+"""
+publicationFacetsResponses = {
+    "200": openapi.Response(
+        description="Facet counts retrieved successfully!",
+        examples={
+            "application/json": {
+                "status": "success",
+                "data": {
+                    "genre": [
+                        {
+                            "value": "<string>",
+                            "count": "<int>"
+                        }
+                    ],
+                    "language": [
+                        {
+                            "value": "<string>",
+                            "count": "<int>"
+                        }
+                    ],
+                    "publisher": [
+                        {
+                            "value": "<string>",
+                            "count": "<int>"
+                        }
+                    ],
+                    "library": [
+                        {
+                            "value": "<int>",
+                            "count": "<int>"
+                        }
+                    ]
+                }
+            }
+        }
+    ),
+    "400": openapi.Response(
+        description="Invalid library id!",
+        examples={
+            "application/json": {
+                "status": "error",
+                "data": "<error_details>"
+            }
+        }
+    )
+}
+"""
+    Settings for Swagger OpenAPI documentation
+"""
+@swagger_auto_schema(
+    tags=["Publication"],
+    method="GET",
+    operation_description="Returns numbers of publications by genre, language, publisher and library they are available at. "
+                          "Counts are computed for the publications matching the filters and cached for a short time.",
+    manual_parameters=[
+        openapi.Parameter("library", openapi.IN_QUERY, description="Only publications available at the library", type=openapi.TYPE_INTEGER),
+    ] + publicationFilterParameters,
+    responses=publicationFacetsResponses,
+    security=[]
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def getPublicationFacets(request):
+    """
+        Function that allows users to get numbers of publications for browsing of the catalogue.
+        Every facet is counted by a single grouped query, the same filters are answered from the cache.
+    """
+    try:
+        library = request.query_params.get('library')
+        library = int(library) if library else None
+    except ValueError:
+        return Response({
+            "status": "error",
+            "data": "Library id must be an integer!"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    # Filters normalized the same way as they are applied, so equal filters share the cache entry
+    signature = json.dumps([
+        library,
+        listKeys(','.join(request.query_params.getlist('tag'))),
+        listKeys(','.join(request.query_params.getlist('author')))
+    ])
+    key = 'publication-facets:' + hashlib.md5(signature.encode()).hexdigest()
+    facets = cache.get(key)
+    if facets is None:
+        items = filterPublications(request, Publication.objects.all())
+        if library is not None:
+            items = items.filter(available_at=library)
+        facets = {
+            facet: [
+                {"value": value, "count": count}
+                for value, count in items.values_list(facet).annotate(count=Count('id')).order_by('-count', facet)
+            ]
+            for facet in PUBLICATION_FACETS
+        }
+        facets['library'] = [
+            {"value": value, "count": count}
+            for value, count in items.filter(available_at__isnull=False).values_list('available_at')
+                                     .annotate(count=Count('id')).order_by('-count', 'available_at')
+        ]
+        cache.set(key, facets, settings.API_FACET_CACHE_TIMEOUT)
+    return Response({
+        "status": "success",
+        "data": facets
+    }, status=status.HTTP_200_OK)
+# ==================================================================================================
+
 # ============================= List publications in selected library ==============================
 """
     Settings for Swagger OpenAPI documentation
 """
+@asyncView
 @swagger_auto_schema(
     tags=["Publication"],
     method="GET",
     operation_description="Allows users what publications are availiable at specified library",
+    manual_parameters=publicationFilterParameters,
     responses=publicationGetResponses,
     security=[]
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cachedResponse(Publication)
 def getPublicationsInLibrary(request, lid):
     """
         Function that allows users to check publications in selected library
     """
-    items = Publication.objects.filter(available_at=lid)
+    items = filterPublications(request, Publication.objects.filter(available_at=lid).prefetch_related('available_at'))
     if not items:
         return Response({
             "status": "error"
@@ -270,18 +585,20 @@ def createPublication(request):
     serializer = PublicationSerializer(data=request.data)
     if serializer.is_valid():
         try:
-            publication = serializer.save()
+            with transaction.atomic():
+                publication = serializer.save()
+                # Open a voting for the new publication in every library
+                Voting.objects.bulk_create([
+                    Voting(library_id=library, publication=publication)
+                    for library in Library.objects.values_list('id', flat=True)
+                ])
+                invalidateCache(Voting)
         except Exception as e:
             return Response({
                 "status": "error",
                 "data": e.args
             }, status=status.HTTP_400_BAD_REQUEST)
         else:
-            for library in Library.objects.all():
-                new_voting = Voting()
-                new_voting.library = library
-                new_voting.publication = publication
-                new_voting.save()
             return Response({
                 "status": "success",
                 "data": serializer.data
@@ -497,18 +814,33 @@ def associatePublicationWithLibrary(request, id, lid):
 def ratePublication(request, id, rate):
     """
         Function that allows users to rate a publication
-        TODO: Create checking mechanism that will ensure that user did not rated same publication
-              multiple times
+        Every user can rate a publication just once.
     """
     publication = get_object_or_404(Publication, id=id)
     if rate < 0 or rate > 10:
         return Response({
             "status": "rate out of range",
         }, status=status.HTTP_406_NOT_ACCEPTABLE)
-    publication.rating = (publication.rated_sum + rate) / (publication.rated_times + 1)
-    publication.rated_times += 1
-    publication.rated_sum += rate
-    publication.save()
+    try:
+        with transaction.atomic():
+            PublicationRating.objects.create(publication_id=publication.id, user_id=request.user.id, rate=rate)
+            # Expressions in SET read the values from before this update
+            Publication.objects.filter(id=publication.id).update(
+                rating=ExpressionWrapper(
+                    Cast(F('rated_sum') + rate, FloatField()) / (F('rated_times') + 1),
+                    output_field=FloatField()
+                ),
+                rated_times=F('rated_times') + 1,
+                rated_sum=F('rated_sum') + rate,
+                updated_at=timezone.now()
+            )
+            invalidateCache(Publication)
+    except IntegrityError:
+        return Response({
+            "status": "error",
+            "data": "You have already rated this publication!"
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    publication.refresh_from_db(fields=['rating', 'rated_times', 'rated_sum'])
     return Response({
         "status": "success",
         "data": PublicationSerializer(publication).data
@@ -8,6 +8,7 @@ from rest_framework.permissions import IsAuthenticated
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from api_app.models import Account
+from api_app.pagination import paginatedResponse, paginationParameters
 from api_app.permissions import IsAdministrator, IsLibrarian
 from api_app.serializers import UserSerializer, UserNormalEditSerializer, UserAdminEditSerializer
 
@@ -335,6 +336,7 @@ def deleteUserByID(request, id):
     tags=["User"],
     method="GET",
     operation_description="Lists all users from the system",
+    manual_parameters=paginationParameters,
     responses=userGetResponses
 )
 @api_view(['GET'])
@@ -345,9 +347,5 @@ def getAllUsers(request):
         This function expects user to be logged in and have required roles.
     """
     users = Account.objects.all()
-    serializer = UserSerializer(users, many=True)
-    return Response({
-        "status": "success",
-        "data": serializer.data
-    }, status=status.HTTP_200_OK)
+    return paginatedResponse(request, users, UserSerializer)
 # ==================================================================================================
\ No newline at end of file
@@ -1,4 +1,7 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_condition import And, Or
 from rest_framework import status
 from rest_framework.response import Response
@@ -6,7 +9,11 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from api_app.asyncviews import asyncView
+from api_app.cache import cachedResponse, invalidateCache
+from api_app.delta import deltaParameters, deltaResponse
 from api_app.models import Voting
+from api_app.pagination import paginatedResponse, paginationParameters
 from api_app.permissions import IsAdministrator, IsLibrarian
 from api_app.serializers import VotingSerializer
 
@@ -51,14 +58,17 @@ votingGetResponses = {
 """
     Settings for Swagger OpenAPI documentation
 """
+@asyncView
 @swagger_auto_schema(
     tags=["Voting"],
     method="GET",
     operation_description="Returns list of all voting in the system or just one specified by an id",
+    manual_parameters=deltaParameters + paginationParameters,
     responses=votingGetResponses
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cachedResponse(Voting)
 def getVoting(request, id=None):
     """
         Function that allows users to list all votings or just selected one
@@ -71,11 +81,9 @@ def getVoting(request, id=None):
             "data": serializer.data
         }, status=status.HTTP_200_OK)
     items = Voting.objects.all()
-    serializer = VotingSerializer(items, many=True)
-    return Response({
-        "status": "success",
-        "data": serializer.data
-    }, status=status.HTTP_200_OK)
+    if 'since' in request.query_params:
+        return deltaResponse(request, items, VotingSerializer)
+    return paginatedResponse(request, items, VotingSerializer)
 # ==================================================================================================
 
 # =================== List information about all votings in specified library ======================
@@ -228,14 +236,18 @@ def vote(request, id):
         return Response({
             "status": "not_availiable"
         },status=status.HTTP_404_NOT_FOUND)
-    if request.user in voting.users.all():
+    # Unique (voting, account) pair in the through table rejects repeated votes
+    try:
+        with transaction.atomic():
+            Voting.users.through.objects.create(voting_id=voting.id, account_id=request.user.id)
+            Voting.objects.filter(id=voting.id).update(votes=F('votes') + 1, updated_at=timezone.now())
+            invalidateCache(Voting)
+    except IntegrityError:
         return Response({
             "status": "error",
             "data": "You have already voted!"
         },status=status.HTTP_401_UNAUTHORIZED)
-    voting.votes += 1
-    voting.users.add(request.user)
-    voting.save()
+    voting.refresh_from_db(fields=['votes'])
     return Response({
         "status": "success",
         "data": VotingSerializer(voting).data
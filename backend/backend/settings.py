@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'drf_yasg',
     'knox',
@@ -100,18 +102,78 @@ DATABASES = {
         "PASSWORD": os.environ.get("SQL_PASSWORD", "password"),
         "HOST": os.environ.get("SQL_HOST", "localhost"),
         "PORT": os.environ.get("SQL_PORT", "5432"),
+        # Seconds a connection is reused by following requests, 0 closes it at the end of every request
+        "CONN_MAX_AGE": int(os.environ.get("SQL_CONN_MAX_AGE", 60)),
+        # Server side cursors don't survive transaction pooling, set SQL_PGBOUNCER=1 when connecting through pgbouncer
+        "DISABLE_SERVER_SIDE_CURSORS": bool(int(os.environ.get("SQL_PGBOUNCER", 0))),
     }
 }
 
+# Reused connections are checked at the start of every request, broken ones (e.g. after a restart of the database) are replaced
+CONN_HEALTH_CHECKS = bool(int(os.environ.get("SQL_CONN_HEALTH_CHECKS", 1)))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         # 'rest_framework.authentication.BasicAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
-        'knox.auth.TokenAuthentication',
+        # Knox tokens, authenticated tokens are cached for API_AUTH_CACHE_TIMEOUT seconds
+        'api_app.authentication.CachedTokenAuthentication',
     ], 
-    'DEFAULT_SCHEMA_CLASS':'rest_framework.schemas.coreapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS':'rest_framework.schemas.coreapi.AutoSchema',
 }
 
+# Default number of items on a page of list endpoints
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", default=100))
+
+# Maximum page size that can be requested using ?page_size=
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", default=1000))
+
+# Cache of public responses and authenticated tokens, it has to be shared by all worker processes so that changes
+# made in one of them invalidate it in the others. Files in a temporary directory by default, memcached or redis
+# when workers run on more hosts. Local memory (LocMemCache) belongs to a single process, gunicorn then runs one worker.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get("CACHE_BACKEND", default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get("CACHE_LOCATION", default=os.path.join(tempfile.gettempdir(), 'api-cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get("CACHE_MAX_ENTRIES", default=10000)),
+        },
+    }
+}
+
+# Maximum number of seconds a public response is cached for, changes of data invalidate it sooner
+API_CACHE_TIMEOUT = int(os.environ.get("API_CACHE_TIMEOUT", default=300))
+
+# Number of seconds an authenticated token and its user are cached for, 0 disables the cache
+API_AUTH_CACHE_TIMEOUT = int(os.environ.get("API_AUTH_CACHE_TIMEOUT", default=60))
+# Local memory is not shared by workers, a token revoked through one of them would still be accepted by the others
+if 'locmem' in CACHES['default']['BACKEND'].lower():
+    API_AUTH_CACHE_TIMEOUT = 0
+
+# Maximum number of tokens of a user (devices logged in at the same time), the oldest ones are deleted on login, 0 for no limit
+API_TOKEN_LIMIT_PER_USER = int(os.environ.get("API_TOKEN_LIMIT_PER_USER", default=10))
+
+# Number of seconds between deletions of expired tokens by every gunicorn worker, 0 disables them
+API_TOKEN_CLEANUP_INTERVAL = int(os.environ.get("API_TOKEN_CLEANUP_INTERVAL", default=3600))
+
+# Public read-only views are served as async views, set it when serving backend.asgi by uvicorn workers
+API_ASYNC_VIEWS = bool(int(os.environ.get("API_ASYNC_VIEWS", default=0)))
+
+# Number of threads of every worker process running the async views
+API_ASYNC_THREADS = int(os.environ.get("API_ASYNC_THREADS", default=8))
+
+# Seconds ?since= synchronizations overlap, has to be longer than the longest transaction changing items
+API_SYNC_MARGIN = int(os.environ.get("API_SYNC_MARGIN", default=60))
+
+# Days deleted items are remembered for ?since= synchronizations, older ones have to synchronize all items again
+API_TOMBSTONE_RETENTION = int(os.environ.get("API_TOMBSTONE_RETENTION", default=30))
+
+# Maximum number of deleted items reported by a synchronization, more of them require synchronizing all items again
+API_SYNC_MAX_DELETED = int(os.environ.get("API_SYNC_MAX_DELETED", default=10000))
+
+# Number of seconds facet counts of the catalogue are cached for the same filters
+API_FACET_CACHE_TIMEOUT = int(os.environ.get("API_FACET_CACHE_TIMEOUT", default=60))
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -132,11 +194,20 @@ AUTH_PASSWORD_VALIDATORS = [
 
 PASSWORD_HASHERS = [
     #'django.contrib.auth.hashers.Argon2PasswordHasher',
-    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'api_app.hashers.PBKDF2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
 ]
 
+# Number of PBKDF2 iterations of new password hashes, existing hashes are updated when users log in
+PASSWORD_HASH_ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS", default=260000))
+
+# Number of threads of every worker process hashing passwords at the same time, other logins wait for them
+PASSWORD_HASH_THREADS = int(os.environ.get("PASSWORD_HASH_THREADS", default=1))
+
+# Number of logins and registrations of every worker process waiting for hashing, more of them are refused with 503 Service Unavailable
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", default=1))
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -0,0 +1,35 @@
+# Settings of gunicorn serving the API in production, every value can be changed by an environment variable
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", default="0.0.0.0:8000")
+# Worker processes, by default the usual (2 x CPU count) + 1
+workers = int(os.environ.get("GUNICORN_WORKERS", default=multiprocessing.cpu_count() * 2 + 1))
+# Local memory cache is not shared between processes, invalidations would reach only the worker making the change
+local_cache = "locmem" in os.environ.get("CACHE_BACKEND", "").lower()
+if local_cache:
+    workers = 1
+# 'gthread' or 'sync' serve backend.wsgi, 'uvicorn.workers.UvicornWorker' serves backend.asgi
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", default="gthread")
+wsgi_app = "backend.asgi:application" if "uvicorn" in worker_class.lower() else "backend.wsgi:application"
+threads = int(os.environ.get("GUNICORN_THREADS", default=4))
+# Seconds an idle keep-alive connection is held open, keep it above the idle timeout of the proxy in front
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", default=5))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", default=30))
+# Seconds running requests get to finish when workers are restarted (kill -HUP) or stopped
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", default=30))
+# Workers are replaced after serving some requests, the jitter keeps them from restarting all at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", default=10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", default=1000))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", default="-")
+errorlog = "-"
+
+def on_starting(server):
+    if local_cache:
+        server.log.warning("CACHE_BACKEND is a local memory cache, running a single worker")
+
+def post_worker_init(worker):
+    # Expired tokens are deleted by every worker from time to time (API_TOKEN_CLEANUP_INTERVAL)
+    from api_app.tokens import startTokenCleanup
+    startTokenCleanup(worker.log)
@@ -0,0 +1,70 @@
+"""
+    Simple load test of the API, measures throughput and latency of GET requests to one endpoint.
+    Every client keeps its connection open, so the numbers show the server rather than connection setup.
+
+    Usage: python load_test.py http://localhost:8000/api/library/ [--clients 16] [--duration 10] [--token <knox token>]
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+def client(url, headers, deadline, latencies, errors, lock):
+    parts = urlsplit(url)
+    path = parts.path + ("?" + parts.query if parts.query else "")
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    connection = connection_class(parts.netloc, timeout=30)
+    measured, failed = [], 0
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                failed += 1
+            if response.getheader("Connection", "").lower() == "close":
+                connection.close()
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            connection.close()
+            continue
+        measured.append(time.perf_counter() - start)
+    connection.close()
+    with lock:
+        latencies.extend(measured)
+        errors.append(failed)
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of a GET endpoint of the API")
+    parser.add_argument("url")
+    parser.add_argument("--clients", type=int, default=16, help="Number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds the test runs")
+    parser.add_argument("--token", help="Knox token for endpoints requiring authentication")
+    args = parser.parse_args()
+
+    headers = {"Authorization": "Token " + args.token} if args.token else {}
+    deadline = time.monotonic() + args.duration
+    latencies, errors, lock = [], [], threading.Lock()
+    threads = [
+        threading.Thread(target=client, args=(args.url, headers, deadline, latencies, errors, lock))
+        for i in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    print("Requests:    %d (%d errors)" % (len(latencies), sum(errors)))
+    print("Throughput:  %.1f req/s" % (len(latencies) / args.duration))
+    if latencies:
+        print("Latency p50: %.1f ms" % (percentile(latencies, 50) * 1000))
+        print("Latency p99: %.1f ms" % (percentile(latencies, 99) * 1000))
+
+if __name__ == "__main__":
+    main()